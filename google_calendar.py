@@ -0,0 +1,281 @@
+import os
+import asyncio
+import threading
+import logging
+from fastapi.concurrency import run_in_threadpool
+from google.oauth2.credentials import Credentials
+from google.auth.transport.requests import Request
+from datetime import datetime, timedelta
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
+import httpx
+import json
+
+from resilience import CircuitBreaker, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Google OAuth settings, read once at import
+GOOGLE_ACCESS_TOKEN = os.getenv("GOOGLE_ACCESS_TOKEN")
+GOOGLE_REFRESH_TOKEN = os.getenv("GOOGLE_REFRESH_TOKEN")
+GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
+GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
+
+# Google credentials are built once (see _get_creds) and shared by every request
+_CREDS = None
+# Serializes refreshes between the background refresher and the inline fallback
+_creds_lock = threading.Lock()
+
+# Refresh the access token this long before it expires so requests never wait on it
+TOKEN_REFRESH_MARGIN = timedelta(minutes=int(os.getenv("GOOGLE_TOKEN_REFRESH_MARGIN_MINUTES", "5")))
+TOKEN_REFRESH_MAX_BACKOFF = 300
+# Inline fallback: refresh when less than this much lifetime is left, rather than
+# waiting for the token to be already expired
+TOKEN_EXPIRY_SKEW = timedelta(seconds=120)
+
+# Refreshed tokens are persisted here so a restart can reuse a still-valid token
+GOOGLE_TOKEN_CACHE = os.getenv("GOOGLE_TOKEN_CACHE", ".google_token.json")
+
+def _load_cached_token():
+    try:
+        with open(GOOGLE_TOKEN_CACHE) as f:
+            data = json.load(f)
+        # Ignore tokens minted for a different refresh token (e.g. another account)
+        if data.get("refresh_token") != GOOGLE_REFRESH_TOKEN:
+            return None
+        expiry = datetime.fromisoformat(data["expiry"]) if data.get("expiry") else None
+        return data["token"], expiry
+    except (OSError, ValueError, KeyError):
+        return None
+
+def _save_token(creds):
+    data = {
+        "token": creds.token,
+        "refresh_token": creds.refresh_token,
+        "expiry": creds.expiry.strftime("%Y-%m-%dT%H:%M:%S") if creds.expiry else None
+    }
+    tmp_path = GOOGLE_TOKEN_CACHE + ".tmp"
+    try:
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, GOOGLE_TOKEN_CACHE)
+    except OSError as e:
+        logger.warning("Could not persist Google token: %s", e)
+
+# One transport for token refreshes; a fresh Request() opens a new requests.Session
+# (and TLS connection to the token endpoint) every time
+_AUTH_REQUEST = Request()
+
+def _refresh(creds):
+    creds.refresh(_AUTH_REQUEST)
+    _save_token(creds)
+
+def _needs_refresh(creds):
+    if not creds.token:
+        return True
+    return bool(creds.expiry) and creds.expiry - datetime.utcnow() < TOKEN_EXPIRY_SKEW
+
+def _ensure_fresh(creds, lock):
+    # Checked under the lock so a burst of requests at expiry triggers a single refresh
+    with lock:
+        if _needs_refresh(creds):
+            _refresh(creds)
+
+def _get_creds():
+    global _CREDS
+    with _creds_lock:
+        if _CREDS is None:
+            token, expiry = _load_cached_token() or (GOOGLE_ACCESS_TOKEN, None)
+            _CREDS = Credentials(
+                token=token,
+                expiry=expiry,
+                refresh_token=GOOGLE_REFRESH_TOKEN,
+                token_uri="https://oauth2.googleapis.com/token",
+                client_id=GOOGLE_CLIENT_ID,
+                client_secret=GOOGLE_CLIENT_SECRET
+            )
+    # Fallback in case the background refresher fell behind
+    _ensure_fresh(_CREDS, _creds_lock)
+    return _CREDS
+
+# Lets one coroutine do the threaded refresh while the others wait on the event loop
+_async_creds_lock = asyncio.Lock()
+
+async def get_creds_async():
+    """
+    Return the shared credentials, only leaving the event loop when they need loading or a refresh.
+    """
+    if _CREDS is not None and not _needs_refresh(_CREDS):
+        return _CREDS
+    async with _async_creds_lock:
+        return await run_in_threadpool(_get_creds)
+
+def _refresh_creds():
+    with _creds_lock:
+        _refresh(_CREDS)
+
+def credentials_loaded():
+    return _CREDS is not None
+
+async def token_refresher():
+    """
+    Refresh the Google access token shortly before it expires, backing off on failures.
+    """
+    backoff = 1
+    while True:
+        expiry = _CREDS.expiry
+        # Without a recorded expiry we can't tell how stale the token is, so refresh now
+        delay = (expiry - TOKEN_REFRESH_MARGIN - datetime.utcnow()).total_seconds() if expiry else 0
+        await asyncio.sleep(max(delay, 0))
+        try:
+            await asyncio.to_thread(_refresh_creds)
+            backoff = 1
+        except Exception as e:
+            logger.warning("Token refresh failed, retrying in %ss: %s", backoff, e)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, TOKEN_REFRESH_MAX_BACKOFF)
+
+CALENDAR_EVENTS_URL = "https://www.googleapis.com/calendar/v3/calendars/primary/events"
+CALENDAR_FREEBUSY_URL = "https://www.googleapis.com/calendar/v3/freeBusy"
+
+class GoogleCredentialsAuth(httpx.Auth):
+    """
+    Attach the shared Google credentials to outgoing requests, refreshing and retrying once on a 401.
+    """
+    async def async_auth_flow(self, request):
+        creds = await get_creds_async()
+        sent_token = creds.token
+        request.headers["Authorization"] = f"Bearer {sent_token}"
+        response = yield request
+
+        if response.status_code == 401:
+            async with _async_creds_lock:
+                # Concurrent 401s for the same token share one refresh
+                if _CREDS.token == sent_token:
+                    await run_in_threadpool(_refresh_creds)
+            request.headers["Authorization"] = f"Bearer {_CREDS.token}"
+            yield request
+
+_GOOGLE_AUTH = GoogleCredentialsAuth()
+
+# The app's pooled client, shared with its other outbound calls; see set_http_client
+_http = None
+
+def set_http_client(client):
+    global _http
+    _http = client
+
+_google_breaker = CircuitBreaker("Google Calendar", CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS)
+
+# Calendar reports quota exhaustion as a 403 with one of these reasons as well as a 429
+GOOGLE_RATE_LIMIT_REASONS = frozenset(("rateLimitExceeded", "userRateLimitExceeded"))
+
+def _is_rate_limit_403(response):
+    try:
+        errors = response.json()["error"]["errors"]
+        return any(e.get("reason") in GOOGLE_RATE_LIMIT_REASONS for e in errors)
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return False
+
+def _is_transient_google_error(e):
+    if isinstance(e, httpx.HTTPStatusError):
+        status = e.response.status_code
+        if status == 403:
+            return _is_rate_limit_403(e.response)
+        return status == 429 or status >= 500
+    return isinstance(e, httpx.TransportError)
+
+async def _google_send(method, url, **kwargs):
+    response = await _http.request(method, url, auth=_GOOGLE_AUTH, **kwargs)
+    response.raise_for_status()
+    return response
+
+_google_send_with_retries = retry(
+    wait=wait_random_exponential(multiplier=0.5, max=8),
+    stop=stop_after_attempt(3),
+    retry=retry_if_exception(_is_transient_google_error),
+    reraise=True
+)(_google_send)
+
+async def google_request(method, url, idempotent=True, **kwargs):
+    """
+    Authorized Calendar API request behind the Google circuit breaker. Idempotent requests
+    are retried with backoff on rate limits, server errors and connection failures.
+    """
+    _google_breaker.check()
+    send = _google_send_with_retries if idempotent else _google_send
+    try:
+        response = await send(method, url, **kwargs)
+    except Exception as e:
+        if _is_transient_google_error(e):
+            _google_breaker.record_failure()
+        raise
+    _google_breaker.record_success()
+    return response
+
+# The most events Calendar returns per page
+CALENDAR_PAGE_SIZE = 2500
+
+async def list_calendar_events(time_min, time_max):
+    """
+    Return every event between time_min and time_max, following nextPageToken so
+    callers filtering a wide window locally never see a truncated list.
+    """
+    params = {
+        "timeMin": time_min,
+        "timeMax": time_max,
+        "singleEvents": "true",
+        "orderBy": "startTime",
+        "maxResults": CALENDAR_PAGE_SIZE
+    }
+    events = []
+    while True:
+        response = await google_request("GET", CALENDAR_EVENTS_URL, params=params)
+        page = response.json()
+        events.extend(page.get("items", []))
+        if not page.get("nextPageToken"):
+            return events
+        params["pageToken"] = page["nextPageToken"]
+
+async def list_busy_intervals(time_min, time_max):
+    """
+    Return the (start, end) datetimes the primary calendar is busy between time_min and time_max.
+    """
+    # A POST, but only a query, so safe to retry
+    response = await google_request(
+        "POST",
+        CALENDAR_FREEBUSY_URL,
+        json={
+            "timeMin": time_min.isoformat(),
+            "timeMax": time_max.isoformat(),
+            "items": [{"id": "primary"}]
+        }
+    )
+    calendar = response.json()["calendars"]["primary"]
+    # A failed lookup comes back as a 200 with an empty busy list, which reads as "free"
+    if calendar.get("errors"):
+        reasons = ", ".join(e.get("reason", "unknown") for e in calendar["errors"])
+        raise RuntimeError(f"Free/busy lookup failed: {reasons}")
+    return [
+        (parse_utc(b["start"]), parse_utc(b["end"]))
+        for b in calendar.get("busy", [])
+    ]
+
+async def create_calendar_event(summary, start_time, end_time, user_timezone):
+    try:
+        event = {
+            'summary': summary,
+            'start': {'dateTime': start_time, 'timeZone': user_timezone},
+            'end': {'dateTime': end_time, 'timeZone': user_timezone}
+        }
+
+        # Not retried: a request that timed out may still have created the event
+        response = await google_request("POST", CALENDAR_EVENTS_URL, idempotent=False, json=event)
+        created_event = response.json()
+        return {"success": True, "event_id": created_event.get("id")}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+def parse_utc(timestamp):
+    # fromisoformat is C-implemented; "Z" is only accepted natively from Python 3.11
+    return datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
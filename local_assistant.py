@@ -1,11 +1,35 @@
+import bisect
+import concurrent.futures
+from contextlib import contextmanager
 import tkinter as tk
 from tkinter import scrolledtext
 import requests
 from pynput import keyboard
 import json
+import orjson
 import re
 from datetime import datetime, timezone, timedelta
 import speech_recognition as sr  # For voice input
+from requests.adapters import HTTPAdapter
+
+PARSE_COMMAND_URL = "http://0.0.0.0:8000/parse-command"
+# (connect, read) seconds. The read timeout has to outlast the server's slowest command:
+# two OpenAI calls of up to OPENAI_TOTAL_TIMEOUT each plus the Calendar requests
+REQUEST_TIMEOUT = (5, 90)
+
+# Shared session so every command reuses the same keep-alive connection
+# to the backend instead of opening a new TCP connection per request.
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
+@contextmanager
+def _editable(widget):
+    # Temporarily enable a read-only Text widget for programmatic edits
+    widget.config(state=tk.NORMAL)
+    try:
+        yield widget
+    finally:
+        widget.config(state=tk.DISABLED)
 
 class SpotlightInterface:
     def __init__(self):
@@ -27,8 +51,41 @@ class SpotlightInterface:
             "Create a new event next Monday at 10 AM",
             "Summarize yesterday's meetings"
         ]
+        # Lowercased once up front so filtering doesn't re-lower every suggestion per keystroke
+        self._suggestions_lower = [(s, s.lower()) for s in self.suggestions]
+
+        # All lowercased suggestions joined into one newline-separated string, so a
+        # search over the full list is a handful of C-level str.find calls instead of
+        # a Python-level substring test per suggestion
+        self._haystack = "\n".join(low for _, low in self._suggestions_lower)
+        self._haystack_starts = []
+        offset = 0
+        for _, low in self._suggestions_lower:
+            self._haystack_starts.append(offset)
+            offset += len(low) + 1
+
+        # Last query and its matches; typing forward only narrows the result,
+        # so the next filter can start from these instead of the full list
+        self._last_typed = ""
+        self._last_filtered = self._suggestions_lower
 
         self.suggestion_box = None
+        # Rows currently in the suggestion Listbox, used to apply delta updates
+        self._listbox_items = []
+
+        # Pending after() ids used to coalesce bursts of keystrokes / resizes
+        self._debounce_id = None
+        self._expand_id = None
+
+        # Worker pool for blocking I/O (backend requests, microphone capture)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+
+        # Speech recognizer and microphone are created on first use and then reused
+        self._recognizer = None
+        self._mic = None
+        # Set while a capture is in flight; the pool has two workers and the microphone
+        # can only be opened once at a time
+        self._listening = False
 
     def create_interface(self):
         self.root = tk.Tk()
@@ -116,21 +173,68 @@ class SpotlightInterface:
         self.root.geometry(f'{window_width}x{window_height}+{x}+{y}')
 
     def on_key_release(self, event):
+        # Wait for a short pause in typing before filtering
+        if self._debounce_id:
+            self.root.after_cancel(self._debounce_id)
+        self._debounce_id = self.root.after(80, self._do_filter)
+
+    def _do_filter(self):
+        self._debounce_id = None
         typed = self.entry.get().strip().lower()
         if not typed:
+            self._last_typed = ""
+            self._last_filtered = self._suggestions_lower
             self.hide_suggestion_box()
             return
 
-        # Filter suggestions
-        filtered = [cmd for cmd in self.suggestions if typed in cmd.lower()]
-        if filtered:
-            self.suggestion_box.delete(0, tk.END)
-            for suggestion in filtered:
-                self.suggestion_box.insert(tk.END, suggestion)
+        # Filter suggestions, refining the previous matches when the query only grew
+        if self._last_typed and typed.startswith(self._last_typed):
+            candidates = (pair for pair in self._last_filtered if typed in pair[1])
+        else:
+            candidates = self.iter_matching_suggestions(typed)
+        matches = self.update_suggestion_box(candidates)
+        self._last_typed = typed
+        self._last_filtered = matches
+
+        if matches:
             self.show_suggestion_box()
         else:
             self.hide_suggestion_box()
 
+    def iter_matching_suggestions(self, typed):
+        if "\n" in typed:
+            return
+        starts = self._haystack_starts
+        pos = self._haystack.find(typed)
+        while pos != -1:
+            i = bisect.bisect_right(starts, pos) - 1
+            yield self._suggestions_lower[i]
+            if i + 1 == len(starts):
+                return
+            # Skip the rest of this suggestion and resume at the next one
+            pos = self._haystack.find(typed, starts[i + 1])
+
+    def update_suggestion_box(self, candidates):
+        # Single pass over the matches: rows that already agree with what is shown
+        # are left alone, and from the first difference on the tail is replaced.
+        # Returns the (original, lowercased) pairs now in the Listbox.
+        shown = self._listbox_items
+        matches = []
+        diverged = False
+        for pair in candidates:
+            k = len(matches)
+            matches.append(pair)
+            if not diverged:
+                if k < len(shown) and shown[k][0] == pair[0]:
+                    continue
+                self.suggestion_box.delete(k, tk.END)
+                diverged = True
+            self.suggestion_box.insert(tk.END, pair[0])
+        if not diverged and len(matches) < len(shown):
+            self.suggestion_box.delete(len(matches), tk.END)
+        self._listbox_items = matches
+        return matches
+
     def show_suggestion_box(self):
         # Position suggestion box below the entry widget
         self.suggestion_box.place(x=self.entry.winfo_x(), y=self.entry.winfo_y() + self.entry.winfo_height())
@@ -152,66 +256,86 @@ class SpotlightInterface:
     def send_command(self, event=None):
         command = self.entry.get().strip()
         if not command:
-            if not self.output_text.winfo_ismapped():
-                self.output_text.pack(pady=20, padx=20, fill=tk.BOTH, expand=True)
-
-            self.output_text.config(state=tk.NORMAL)
-            self.output_text.delete(1.0, tk.END)
-            self.output_text.insert(tk.END, "Please enter a command.")
-            self.output_text.config(state=tk.DISABLED)
-            self.auto_expand_window()
+            self.display_message("Please enter a command.")
             return
 
         # Hide suggestions when user presses Enter
         self.hide_suggestion_box()
-
+        self._submit(command)
+
+    def _submit(self, command):
+        # Run the request on a worker thread so the Tk main loop stays responsive
+        # while the backend talks to GPT; results are marshalled back with after().
+        future = self._executor.submit(self._do_request, command)
+        future.add_done_callback(lambda f: self.root.after(0, self._render_result, f))
+
+    def _do_request(self, command):
+        with _SESSION.post(PARSE_COMMAND_URL, json={"command": command}, timeout=REQUEST_TIMEOUT, stream=True) as response:
+            if response.headers.get("content-type", "").startswith("text/event-stream"):
+                # Meeting summaries are streamed; show the text as it arrives
+                self.root.after(0, self.display_message, "")
+                self._read_events(response)
+                return None
+            return orjson.loads(response.content)
+
+    def _read_events(self, response):
+        event = None
+        for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = orjson.loads(line[len("data: "):])
+                if event == "done":
+                    return
+                elif event == "error":
+                    self.root.after(0, self.append_message, f"\n\nError: {data}")
+                    return
+                self.root.after(0, self.append_message, data)
+            elif not line:
+                event = None
+
+    def _render_result(self, future):
         try:
-            response = requests.post("http://0.0.0.0:8000/parse-command", json={"command": command})
-            result = response.json()
-            print(result)
-
-            if not self.output_text.winfo_ismapped():
-                self.output_text.pack(pady=20, padx=20, fill=tk.BOTH, expand=True)
-
-            self.output_text.config(state=tk.NORMAL)
-            self.output_text.delete(1.0, tk.END)
-
-            if "success" in result and result["success"]:
-                self.output_text.insert(tk.END, f"Event created successfully: {result.get('event_id')}")
-            elif "summary" in result:
-                self.output_text.insert(tk.END, f"{result['summary']}")
-            elif "message" in result:
-                self.output_text.insert(tk.END, f"{result['message']}")
-            elif "error" in result:
-                self.output_text.insert(tk.END, f"Error: {result['error']}")
-            else:
-                self.output_text.insert(tk.END, f"Response: {result}")
-
-            self.output_text.config(state=tk.DISABLED)
-            self.auto_expand_window()
-
+            result = future.result()
         except Exception as e:
-            if not self.output_text.winfo_ismapped():
-                self.output_text.pack(pady=20, padx=20, fill=tk.BOTH, expand=True)
+            self.display_message(f"Failed to connect: {str(e)}")
+            return
+
+        if result is None:
+            # Already rendered while streaming
+            return
+
+        print(result)
 
-            self.output_text.config(state=tk.NORMAL)
-            self.output_text.delete(1.0, tk.END)
-            self.output_text.insert(tk.END, f"Failed to connect: {str(e)}")
-            self.output_text.config(state=tk.DISABLED)
-            self.auto_expand_window()
+        if "success" in result and result["success"]:
+            self.display_message(f"Event created successfully: {result.get('event_id')}")
+        elif "summary" in result:
+            self.display_message(f"{result['summary']}")
+        elif "message" in result:
+            self.display_message(f"{result['message']}")
+        elif "error" in result:
+            self.display_message(f"Error: {result['error']}")
+        else:
+            self.display_message(f"Response: {result}")
 
     def auto_expand_window(self):
         """
         Automatically expand the window size based on the content in the output_text widget.
+        Successive calls are coalesced into a single resize on the next idle pass.
         """
-        self.output_text.update_idletasks()
+        if self._expand_id is None:
+            self._expand_id = self.root.after_idle(self._resize_to_output)
 
+    def _resize_to_output(self):
+        self._expand_id = None
+
+        # The text index is current right after insert, so no forced update is needed;
+        # Tk lays out the new geometry on its next idle pass
         line_count = int(self.output_text.index('end').split('.')[0])
         text_height = line_count * 20
         current_width = self.root.winfo_width()
         new_height = max(75, min(500, text_height + 100))
         self.root.geometry(f"{current_width}x{new_height}")
-        self.root.update()
 
     def toggle_visibility(self):
         if self.is_visible:
@@ -233,23 +357,23 @@ class SpotlightInterface:
             self.root.after(0, self.toggle_visibility)
 
         hotkey_combination = '<ctrl>+o'
+        hotkey_keys = keyboard.HotKey.parse(hotkey_combination)
 
-        hotkey = keyboard.HotKey(
-            keyboard.HotKey.parse(hotkey_combination),
-            on_activate
-        )
+        hotkey = keyboard.HotKey(hotkey_keys, on_activate)
+
+        # Every key typed system-wide comes through here, so ignore anything
+        # that isn't part of the hotkey before touching the HotKey state
+        self._hotkey_keys = frozenset(hotkey_keys)
 
         def on_press(key):
-            try:
-                hotkey.press(listener.canonical(key))
-            except:
-                pass
+            key = listener.canonical(key)
+            if key in self._hotkey_keys:
+                hotkey.press(key)
 
         def on_release(key):
-            try:
-                hotkey.release(listener.canonical(key))
-            except:
-                pass
+            key = listener.canonical(key)
+            if key in self._hotkey_keys:
+                hotkey.release(key)
 
         listener = keyboard.Listener(
             on_press=on_press,
@@ -265,14 +389,30 @@ class SpotlightInterface:
         root.mainloop()
 
     def start_voice_input(self):
-        r = sr.Recognizer()
+        if self._listening:
+            return
+        self._listening = True
         self.display_message("Listening... Please speak now.")
-
-        with sr.Microphone() as source:
-            audio = r.listen(source, phrase_time_limit=5)  # Adjust as needed
-
+        # Listening blocks for up to phrase_time_limit seconds, so keep it off the Tk thread
+        future = self._executor.submit(self._listen)
+        future.add_done_callback(lambda f: self.root.after(0, self._render_voice_result, f))
+
+    def _listen(self):
+        if self._mic is None:
+            self._recognizer = sr.Recognizer()
+            self._mic = sr.Microphone()
+            # Calibrate once rather than on every invocation
+            with self._mic as source:
+                self._recognizer.adjust_for_ambient_noise(source, duration=0.3)
+
+        with self._mic as source:
+            audio = self._recognizer.listen(source, phrase_time_limit=5)  # Adjust as needed
+        return self._recognizer.recognize_google(audio)
+
+    def _render_voice_result(self, future):
+        self._listening = False
         try:
-            command = r.recognize_google(audio)
+            command = future.result()
             self.entry.delete(0, tk.END)
             self.entry.insert(tk.END, command)
             self.display_message(f"You said: {command}")
@@ -280,15 +420,21 @@ class SpotlightInterface:
             self.display_message("Sorry, I didn't catch that.")
         except sr.RequestError as e:
             self.display_message("Could not request results from speech service.")
+        except Exception as e:
+            # e.g. no input device (OSError) or a microphone left open by a failed capture
+            self.display_message(f"Voice input failed: {str(e)}")
+
+    def append_message(self, text):
+        with _editable(self.output_text):
+            self.output_text.insert(tk.END, text)
+        self.auto_expand_window()
 
     def display_message(self, message):
         if not self.output_text.winfo_ismapped():
             self.output_text.pack(pady=20, padx=20, fill=tk.BOTH, expand=True)
 
-        self.output_text.config(state=tk.NORMAL)
-        self.output_text.delete(1.0, tk.END)
-        self.output_text.insert(tk.END, message)
-        self.output_text.config(state=tk.DISABLED)
+        with _editable(self.output_text):
+            self.output_text.replace(1.0, tk.END, message)
         self.auto_expand_window()
 
 
@@ -1,150 +1,374 @@
 import os
-from openai import OpenAI
-from fastapi import FastAPI, HTTPException
+import asyncio
+import ipaddress
+import logging
+import queue
+import re
+from logging.handlers import QueueHandler, QueueListener
+from typing import List, Optional, Union
+from fastapi import FastAPI, HTTPException, Request as ClientRequest
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
-import pytz
-from pytz.exceptions import UnknownTimeZoneError
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from dotenv import load_dotenv
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
-from datetime import datetime, timedelta
-import requests
-import json
-import re
-
+from datetime import date, datetime, timedelta
+from dateutil.relativedelta import relativedelta, MO
+from cachetools import LRUCache, TTLCache
+import httpx
+import orjson
+from functools import lru_cache
+
+# Before the local imports below: they read their settings from the environment at import
 load_dotenv()
 
-app = FastAPI()
+import google_calendar
+from google_calendar import (
+    create_calendar_event,
+    credentials_loaded,
+    get_creds_async,
+    list_busy_intervals,
+    list_calendar_events,
+    parse_utc,
+    token_refresher
+)
+from openai_utils import client, chat_completion, OPENAI_CLASSIFY_MODEL, JSON_MAX_TOKENS, SUMMARY_MAX_TOKENS
+from prompts import (
+    CLASSIFY_PROMPT,
+    USER_RESPONSE_PROMPT,
+    MEETING_SUMMARY_PROMPT,
+    UPCOMING_SUMMARY_PROMPT,
+    PAST_SUMMARY_PROMPT,
+    EVENT_EXTRACTION_PROMPT,
+    DATE_TIME_PROMPT,
+    prompt_messages
+)
+
+# Handlers only enqueue records; a background thread does the actual stderr writes.
+# The queue handler sits on the root logger so every module shares it, but only this
+# app's loggers are lowered to LOG_LEVEL, keeping library INFO chatter out
+_log_queue = queue.SimpleQueue()
+_log_stream_handler = logging.StreamHandler()
+_log_stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+_log_listener = QueueListener(_log_queue, _log_stream_handler)
+_log_listener.start()
+logging.getLogger().addHandler(QueueHandler(_log_queue))
+for _logger_name in (__name__, google_calendar.__name__):
+    logging.getLogger(_logger_name).setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+logger = logging.getLogger(__name__)
+
+UTC = ZoneInfo("UTC")
+
+@lru_cache(maxsize=512)
+def _tz(name):
+    """
+    ZoneInfo for name, or UTC when the name is missing or unknown.
+    """
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        logger.warning("Unknown time zone: %r", name)
+        return UTC
 
-# In-memory store for pending events
-pending_events = {}
+app = FastAPI(default_response_class=ORJSONResponse)
 
-class CommandRequest(BaseModel):
-    command: str
+# Events waiting on the user's confirmation, keyed by user id; abandoned ones expire
+PENDING_EVENT_TTL = 600
+pending_events = TTLCache(maxsize=10000, ttl=PENDING_EVENT_TTL)
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+DEFAULT_USER_ID = "default_user"
 
-def get_user_timezone():
+class CommandRequest(BaseModel):
+    command: str
+    # Keys pending confirmations; single-user clients can leave it unset
+    user_id: str = DEFAULT_USER_ID
+    # IANA zone name; looked up from the caller's IP when omitted
+    user_timezone: Optional[str] = None
+
+@app.on_event("startup")
+async def open_http_client():
+    # One pooled client for all outbound HTTP (Google Calendar, ipinfo), reusing connections across requests
+    app.state.http = httpx.AsyncClient(
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        timeout=30.0,
+        http2=True
+    )
+    google_calendar.set_http_client(app.state.http)
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await app.state.http.aclose()
+    await client.close()
+
+@app.on_event("shutdown")
+def stop_log_listener():
+    # Flushes any queued records
+    _log_listener.stop()
+
+# A caller's timezone practically never changes, so ipinfo lookups are cached per
+# address; failures fall back to UTC without being cached
+TIMEZONE_CACHE_TTL = 86400
+TIMEZONE_CACHE_SIZE = 10000
+_timezone_cache = TTLCache(maxsize=TIMEZONE_CACHE_SIZE, ttl=TIMEZONE_CACHE_TTL)
+
+def _ipinfo_url(client_ip):
+    # Loopback and LAN callers share the server's public address, so ask about that one
+    try:
+        if ipaddress.ip_address(client_ip).is_global:
+            return f"https://ipinfo.io/{client_ip}"
+    except ValueError:
+        pass
+    return "https://ipinfo.io"
+
+async def get_user_timezone(client_ip=None):
+    url = _ipinfo_url(client_ip) if client_ip else "https://ipinfo.io"
+    timezone = _timezone_cache.get(url)
+    if timezone is not None:
+        return timezone
     try:
-        response = requests.get("https://ipinfo.io", timeout=5)
-        data = response.json()
-        return data.get("timezone", "UTC")
+        response = await app.state.http.get(url, timeout=5)
+        response.raise_for_status()
+        timezone = response.json().get("timezone")
+        if not timezone:
+            # e.g. bogon addresses; fall back without pinning the caller to UTC
+            logger.warning("No time zone in ipinfo response for %s", url)
+            return "UTC"
+        _timezone_cache[url] = timezone
+        return timezone
     except Exception as e:
-        print(f"Time zone detection failed: {e}")
+        logger.warning("Time zone detection failed: %s", e)
         return "UTC"
 
-def build_service():
-    creds = Credentials(
-        token=os.getenv("GOOGLE_ACCESS_TOKEN"),
-        refresh_token=os.getenv("GOOGLE_REFRESH_TOKEN"),
-        token_uri="https://oauth2.googleapis.com/token",
-        client_id=os.getenv("GOOGLE_CLIENT_ID"),
-        client_secret=os.getenv("GOOGLE_CLIENT_SECRET")
-    )
-    if creds.expired:
-        creds.refresh(Request())
-    return build('calendar', 'v3', credentials=creds)
-
-def create_calendar_event(summary, start_time, end_time, user_timezone):
+async def request_timezone(request: Union[CommandRequest, "BulkSummaryRequest"], http_request: ClientRequest = None):
+    """
+    Prefer the timezone the client sent, falling back to an IP lookup when it's missing or unknown.
+    """
+    # _tz falls back to UTC for unknown names, so a matching key means the name is valid
+    if request.user_timezone and _tz(request.user_timezone).key == request.user_timezone:
+        return request.user_timezone
+    client_ip = http_request.client.host if http_request and http_request.client else None
+    return await get_user_timezone(client_ip)
+
+async def warm_credentials():
+    # Load credentials up front so the first request doesn't pay for it
     try:
-        service = build_service()
-        event = {
-            'summary': summary,
-            'start': {'dateTime': start_time, 'timeZone': user_timezone},
-            'end': {'dateTime': end_time, 'timeZone': user_timezone}
-        }
-
-        created_event = service.events().insert(calendarId='primary', body=event).execute()
-        return {"success": True, "event_id": created_event.get("id")}
+        await get_creds_async()
     except Exception as e:
-        return {"success": False, "error": str(e)}
-
-def classify_command(command: str, attempt: int = 1) -> str:
-    prompt = f"""
-    You are a helpful assistant. Classify the following command into one of these categories:
-    - "meeting-summary"
-    - "create-event"
-    - "date-time-interpretation"
-    - "confirmation" (for user responses like "Yes", "No", "That works", "Please schedule")
-
-    Command: "{command}"
+        logger.warning("Credential warm-up failed: %s", e)
+
+@app.on_event("startup")
+async def warm_caches():
+    # The ipinfo lookup and the token load are independent, so overlap them
+    # instead of blocking the event loop on the credential refresh
+    await asyncio.gather(get_user_timezone(), warm_credentials())
+
+@app.on_event("startup")
+async def start_token_refresher():
+    if credentials_loaded():
+        app.state.token_refresher = asyncio.create_task(token_refresher())
+
+@app.on_event("shutdown")
+async def stop_token_refresher():
+    task = getattr(app.state, "token_refresher", None)
+    if task:
+        task.cancel()
+
+# Fields each intent's handler needs from the routing call's payload
+INTENT_FIELDS = {
+    "meeting-summary": ["start_date", "end_date"],
+    "create-event": ["title", "date", "time", "duration_minutes"],
+    "date-time-interpretation": ["date", "time"],
+    "confirmation": []
+}
+
+# Replies that are unambiguously confirmations and never need a GPT call
+CONFIRMATION_REPLIES = frozenset([
+    "yes", "no", "sure", "okay", "that works", "please schedule", "ok", "no thanks", "not good"
+])
+
+# Routing results for repeated commands, keyed on (normalized command, current date)
+# since the extracted dates are relative to today
+CLASSIFY_CACHE_SIZE = 1024
+_classify_cache = LRUCache(maxsize=CLASSIFY_CACHE_SIZE)
+_classify_cache_stats = {"hits": 0, "misses": 0}
+
+async def classify_command(command: str, current_date: str, confirmation_pending: bool = False):
+    """
+    Classify the command and extract the fields its handler needs.
+    Returns (intent, payload); payload is None when only the intent is known.
+    """
+    normalized = command.strip().lower()
+    if normalized in CONFIRMATION_REPLIES:
+        return "confirmation", {}
+
+    # Skip the routing call only when a single keyword family matches; the
+    # handler extracts its own fields. While an event waits on the user's answer,
+    # replies like "Yes, please schedule it" would match the scheduling keywords,
+    # so GPT tells those apart from new commands
+    if not confirmation_pending:
+        intent = _unambiguous_keyword_intent(normalized)
+        if intent is not None:
+            return intent, None
+
+    key = (normalized, current_date)
+    cached = _classify_cache.get(key)
+    if cached is not None:
+        _classify_cache_stats["hits"] += 1
+        return cached
+    _classify_cache_stats["misses"] += 1
+
+    intent, payload = await _classify_uncached(command, current_date)
+    # Heuristic fallbacks (payload None) are not cached so GPT gets another chance
+    if payload is not None:
+        _classify_cache[key] = (intent, payload)
+    return intent, payload
+
+async def _classify_uncached(command: str, current_date: str):
+    """
+    Classify the command and extract the fields its handler needs in a single GPT call.
     """
     try:
-        response = client.chat.completions.create(
+        response = await chat_completion(
             model="gpt-4o",
-            messages=[{"role": "system", "content": prompt}]
+            messages=prompt_messages(CLASSIFY_PROMPT, command, f"Today's date is {current_date}."),
+            response_format={"type": "json_object"},
+            max_tokens=JSON_MAX_TOKENS,
+            temperature=0
         )
-        classification = response.choices[0].message.content.strip()
-        if classification not in ["meeting-summary", "create-event", "date-time-interpretation", "confirmation"]:
+        routed = orjson.loads(response.choices[0].message.content)
+        intent = routed.get("intent")
+        if intent not in INTENT_FIELDS:
             raise ValueError("Invalid classification returned by GPT.")
-        return classification
+        payload = routed.get("payload") or {}
+        if not all(k in payload for k in INTENT_FIELDS[intent]):
+            # Let the handler extract its own fields
+            payload = None
+        return intent, payload
     except Exception as e:
-        print(f"GPT classification attempt {attempt} failed: {e}")
-        if attempt == 1:
-            return classify_command(command, attempt=2)
-        else:
-            return heuristic_classification(command)
+        # chat_completion already retried transient errors (or the circuit is open)
+        logger.warning("GPT classification failed: %s", e)
+        return heuristic_classification(command), None
+
+SUMMARY_KEYWORDS = (
+    "summarize", "spent my time", "spend my time",
+    "what did my week look like", "last week", "this week", "next week",
+    "this month", "last month", "look like"
+)
+CREATE_EVENT_KEYWORDS = ("create", "schedule", "book", "set up", "block")
+
+def _unambiguous_keyword_intent(cmd_lower):
+    # "Book a meeting next week" matches both families, so it's left to GPT
+    is_summary = any(keyword in cmd_lower for keyword in SUMMARY_KEYWORDS)
+    is_create = any(keyword in cmd_lower for keyword in CREATE_EVENT_KEYWORDS)
+    if is_summary != is_create:
+        return "meeting-summary" if is_summary else "create-event"
+    return None
 
 def heuristic_classification(command: str) -> str:
-    cmd_lower = command.lower()
-    if any(keyword in cmd_lower for keyword in [
-        "summarize", "spent my time", "spend my time",
-        "what did my week look like", "last week", "this week", "next week", 
-        "this month", "last month", "look like"
-    ]):
+    cmd_lower = command.strip().lower()
+    if cmd_lower in CONFIRMATION_REPLIES:
+        return "confirmation"
+    elif any(keyword in cmd_lower for keyword in SUMMARY_KEYWORDS):
         return "meeting-summary"
-    elif any(keyword in cmd_lower for keyword in ["create", "schedule", "book", "set up", "block"]):
+    elif any(keyword in cmd_lower for keyword in CREATE_EVENT_KEYWORDS):
         return "create-event"
-    elif cmd_lower in ["yes", "no", "sure", "okay", "that works", "please schedule", "ok", "no thanks", "not good"]:
-        return "confirmation"
     else:
         return "date-time-interpretation"
 
 @app.post("/parse-command")
-def parse_with_classification(request: CommandRequest):
+async def parse_with_classification(request: CommandRequest, http_request: ClientRequest):
     try:
-        classification = classify_command(request.command)
-        print(f"Classified command '{request.command}' as '{classification}'")
+        user_timezone = await request_timezone(request, http_request)
+        user_tz = _tz(user_timezone)
+        user_timezone = user_tz.key
+        current_date = datetime.now(user_tz).strftime("%Y-%m-%d")
 
+        classification, payload = await classify_command(
+            request.command, current_date, confirmation_pending=request.user_id in pending_events
+        )
+        logger.debug("Classified command %r as %r", request.command, classification)
+
+        # When the routing call already extracted the handler's fields, act on them
+        # directly instead of paying for a second GPT call inside the endpoint
         if classification == "meeting-summary":
-            return meeting_summary_command(request)
+            if payload:
+                return await summarize_meetings(request.command, payload, user_tz)
+            return await meeting_summary_command(request, http_request)
         elif classification == "create-event":
-            return interpret_and_create_event(request)
+            if payload:
+                return await schedule_event(payload, user_timezone, user_tz, request.user_id)
+            return await interpret_and_create_event(request, http_request)
         elif classification == "confirmation":
-            return handle_confirmation(request)
+            return await handle_confirmation(request)
         elif classification == "date-time-interpretation":
-            return interpret_command_date_time(request)
+            if payload:
+                return {"date": payload["date"], "time": payload["time"]}
+            return await interpret_command_date_time(request)
         else:
             return {"message": "I'm having trouble understanding your request. Could you try rephrasing it?"}
 
     except Exception as e:
-        print(f"Error processing command: {e}")
+        logger.exception("Error processing command: %s", e)
         return {"error": "I'm having trouble understanding your request right now. Please try again later."}
 
-def classify_user_response(response: str) -> str:
+@app.get("/cache-stats")
+async def cache_stats():
+    return {
+        "classify_command": {
+            **_classify_cache_stats,
+            "size": _classify_cache.currsize,
+            "maxsize": _classify_cache.maxsize
+        },
+        "classify_user_response": {
+            **_user_response_cache_stats,
+            "size": _user_response_cache.currsize,
+            "maxsize": _user_response_cache.maxsize
+        }
+    }
+
+# Exact replies to a scheduling suggestion that never need a GPT call
+USER_RESPONSE_REPLIES = {
+    "yes": "affirmation", "sure": "affirmation", "ok": "affirmation", "okay": "affirmation",
+    "that works": "affirmation", "please schedule": "affirmation",
+    "no": "rejection", "nah": "rejection", "no thanks": "rejection", "not good": "rejection",
+    "doesn't work": "rejection"
+}
+
+_user_response_cache = LRUCache(maxsize=CLASSIFY_CACHE_SIZE)
+_user_response_cache_stats = {"hits": 0, "misses": 0}
+
+async def classify_user_response(response: str) -> str:
     """
     Classify user response into 'affirmation', 'rejection', or 'unclear'.
     """
-    prompt = f"""
-    You are a helpful assistant. Classify the user's response into one of three categories:
-    - "affirmation" if the user indicates agreement or acceptance (e.g. "Yes", "That works", "Please schedule", "Sure", "Ok")
-    - "rejection" if the user indicates disagreement or refusal (e.g. "No", "Not good", "Doesn't work", "No thanks")
-    - "unclear" if it's not clear whether the user accepts or rejects.
+    normalized = response.strip().lower()
+    if normalized in USER_RESPONSE_REPLIES:
+        return USER_RESPONSE_REPLIES[normalized]
+
+    cached = _user_response_cache.get(normalized)
+    if cached is not None:
+        _user_response_cache_stats["hits"] += 1
+        return cached
+    _user_response_cache_stats["misses"] += 1
 
-    User response: "{response}"
-    """
     try:
-        resp = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "system", "content": prompt}]
+        resp = await chat_completion(
+            model=OPENAI_CLASSIFY_MODEL,
+            messages=prompt_messages(USER_RESPONSE_PROMPT, response),
+            # Enough for any of the three labels
+            max_tokens=4,
+            temperature=0
         )
         classification = resp.choices[0].message.content.strip().lower()
         if classification not in ["affirmation", "rejection", "unclear"]:
-            classification = "unclear"
+            # Off-label output isn't cached, nor are the heuristic fallbacks below,
+            # so GPT gets another chance next time
+            return "unclear"
+        _user_response_cache[normalized] = classification
         return classification
-    except:
+    except Exception as e:
         # Fallback heuristic if GPT call fails
+        logger.warning("GPT response classification failed: %s", e)
         resp_lower = response.lower()
         if any(word in resp_lower for word in ["yes", "sure", "ok", "that works", "please schedule"]):
             return "affirmation"
@@ -153,23 +377,24 @@ def classify_user_response(response: str) -> str:
         else:
             return "unclear"
 
-def handle_confirmation(request: CommandRequest):
-    user_id = "default_user"
-    if user_id not in pending_events:
+async def handle_confirmation(request: CommandRequest):
+    user_id = request.user_id
+    event_data = pending_events.get(user_id)
+    if event_data is None:
         return {"message": "There's nothing pending to confirm."}
 
-    event_data = pending_events[user_id]
-    classification = classify_user_response(request.command)
+    classification = await classify_user_response(request.command)
 
     if classification == "affirmation":
         # Schedule the event (either overlapping or the suggested time)
-        result = create_calendar_event(
+        result = await create_calendar_event(
             summary=event_data["title"],
             start_time=event_data["start_time"],
             end_time=event_data["end_time"],
             user_timezone=event_data["user_timezone"]
         )
-        del pending_events[user_id]
+        # May already have expired while the reply was classified
+        pending_events.pop(user_id, None)
         if result.get("success"):
             local_time_str = convert_utc_to_local(event_data["start_time"], event_data["user_timezone"])
             return {"message": f"Scheduled '{event_data['title']}' on {local_time_str}"}
@@ -177,227 +402,411 @@ def handle_confirmation(request: CommandRequest):
             return {"error": "Failed to schedule event."}
     elif classification == "rejection":
         # User rejects the suggestion, try another time
-        return suggest_alternative_time(event_data)
+        return await suggest_alternative_time(event_data, user_id)
     else:
         return {"message": "I didn't understand your response. Would you like to schedule anyway or find another time?"}
 
-def suggest_alternative_time(event_data):
-    user_id = "default_user"
+# Alternative slots are offered in 30 minute steps up to this many steps past the requested time
+MAX_SUGGESTION_INCREMENTS = 11
+
+async def suggest_alternative_time(event_data, user_id=DEFAULT_USER_ID):
     user_timezone = event_data["user_timezone"]
-    user_tz = pytz.timezone(user_timezone)
     duration_minutes = event_data["duration_minutes"]
-    service = build_service()
 
     increments_tried = event_data.get("increments_tried", 0)
-    event_start_utc = datetime.strptime(event_data["start_time"], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=pytz.utc)
+    event_start_utc = parse_utc(event_data["start_time"])
     increment = timedelta(minutes=30)
-    suggested_start = event_start_utc + increment*(increments_tried+1)
-
-    while True:
-        suggested_end = suggested_start + timedelta(minutes=duration_minutes)
-        check_result = service.events().list(
-            calendarId='primary',
-            timeMin=suggested_start.isoformat(),
-            timeMax=suggested_end.isoformat(),
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-
-        if not check_result.get('items', []):
-            # Found a free slot
-            local_suggested_str = convert_utc_to_local(suggested_start.strftime("%Y-%m-%dT%H:%M:%SZ"), user_timezone)
-            event_data["start_time"] = suggested_start.strftime("%Y-%m-%dT%H:%M:%SZ")
-            event_data["end_time"] = suggested_end.strftime("%Y-%m-%dT%H:%M:%SZ")
-            event_data["increments_tried"] = increments_tried + 1
-            pending_events[user_id] = event_data
-            return {"message": f"Your requested time was booked. How about {local_suggested_str}?"}
-
-        suggested_start += increment
-        increments_tried += 1
-
-        if increments_tried > 10:
-            return {"message": "I'm having trouble finding a free slot. Please try a different time."}
+    duration = timedelta(minutes=duration_minutes)
+
+    # Fetch the busy intervals covering every candidate slot in one request, then
+    # search the slots locally
+    candidates = range(increments_tried + 1, max(increments_tried + 1, MAX_SUGGESTION_INCREMENTS) + 1)
+    busy = await list_busy_intervals(
+        event_start_utc + increment * candidates[0],
+        event_start_utc + increment * candidates[-1] + duration
+    )
+
+    for increment_count in candidates:
+        suggested_start = event_start_utc + increment * increment_count
+        suggested_end = suggested_start + duration
+        if any(busy_start < suggested_end and suggested_start < busy_end for busy_start, busy_end in busy):
+            continue
+
+        # Found a free slot
+        local_suggested_str = convert_utc_to_local(suggested_start.strftime("%Y-%m-%dT%H:%M:%SZ"), user_timezone)
+        event_data["start_time"] = suggested_start.strftime("%Y-%m-%dT%H:%M:%SZ")
+        event_data["end_time"] = suggested_end.strftime("%Y-%m-%dT%H:%M:%SZ")
+        event_data["increments_tried"] = increment_count
+        pending_events[user_id] = event_data
+        return {"message": f"Your requested time was booked. How about {local_suggested_str}?"}
+
+    return {"message": "I'm having trouble finding a free slot. Please try a different time."}
 
 def convert_utc_to_local(utc_str, user_timezone):
-    utc_time = datetime.strptime(utc_str, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=pytz.utc)
-    user_tz = pytz.timezone(user_timezone)
+    utc_time = parse_utc(utc_str)
+    user_tz = _tz(user_timezone)
     local_time = utc_time.astimezone(user_tz)
     return local_time.strftime("%m/%d/%Y at %I:%M %p %Z")
 
 
 @app.post("/meeting-summary-command")
-def meeting_summary_command(request: CommandRequest):
+async def meeting_summary_command(request: CommandRequest, http_request: ClientRequest):
     """
     Generate a meeting summary based on user input, handling both past and future requests.
     """
-    user_timezone = get_user_timezone()
-    user_tz = pytz.timezone(user_timezone)
+    user_timezone = await request_timezone(request, http_request)
+    user_tz = _tz(user_timezone)
 
-    current_date = datetime.now(user_tz).strftime("%Y-%m-%d")
+    today = datetime.now(user_tz).date()
+    current_date = today.strftime("%Y-%m-%d")
+
+    # The common relative phrases resolve locally, leaving only the summary call
+    date_range = resolve_date_range(request.command, today)
+    if date_range is not None:
+        return await summarize_meetings(request.command, date_range, user_tz)
 
     # Updated prompt to handle past, present, and future (including "next week")
-    prompt = f"""
-    You are a helpful assistant. Today's date is {current_date}.
-    Parse the following command and identify the desired date range for summarizing meetings.
-
-    Command: "{request.command}"
-
-    Consider that the user may ask about past or future time periods.
-    - "last week" should mean the full calendar week before today.
-    - "this week" should mean the current week including today's date.
-    - "next week" should mean the full upcoming calendar week, Monday through Sunday, after the current week.
-    - "tomorrow" should mean one single day: tomorrow's date.
-    - "yesterday" should mean one single day: yesterday's date.
-    - "last month" should mean the full calendar month before today.
-    - "this month" should mean the current month including today's date.
-    - "next month" should mean the full upcoming calendar month, after the current month.
-
-    Return a JSON object with fields: "start_date" and "end_date" in YYYY-MM-DD format.
-    """
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "system", "content": prompt}]
-        )
-        parsed_data = response.choices[0].message.content
-        print(f"Parsed Date Range: {parsed_data}")
-
-        json_match = re.search(r"\{.*?\}", parsed_data, re.DOTALL)
-        date_range = json.loads(json_match.group())
-
-        # Fetch events from Google Calendar for the given date range
-        creds = Credentials(
-            token=os.getenv("GOOGLE_ACCESS_TOKEN"),
-            refresh_token=os.getenv("GOOGLE_REFRESH_TOKEN"),
-            token_uri="https://oauth2.googleapis.com/token",
-            client_id=os.getenv("GOOGLE_CLIENT_ID"),
-            client_secret=os.getenv("GOOGLE_CLIENT_SECRET")
+        # Fetch a window covering every period the prompt describes while GPT works out
+        # the exact range, so the calendar round trip overlaps the GPT one
+        window_start, window_end = _speculative_window(today)
+        date_range, window_events = await asyncio.gather(
+            _gpt_date_range(request.command, current_date),
+            list_calendar_events(f"{window_start}T00:00:00Z", f"{window_end}T23:59:59Z"),
+            return_exceptions=True
         )
-        if creds.expired:
-            creds.refresh(Request())
-        service = build('calendar', 'v3', credentials=creds)
-
-        start_datetime = f"{date_range['start_date']}T00:00:00Z"
-        end_datetime = f"{date_range['end_date']}T23:59:59Z"
-
-        events_result = service.events().list(
-            calendarId='primary',
-            timeMin=start_datetime,
-            timeMax=end_datetime,
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-
-        events = events_result.get('items', [])
-        if not events:
-            return {"message": "No meetings found in the specified date range."}
-
-        meetings_text = "\n".join([
-            f"- {event.get('summary', 'No Title')}, Start: {event['start'].get('dateTime')}, "
-            f"End: {event['end'].get('dateTime')}"
-            for event in events
-        ])
-
-        # Determine if the date range is in the future or past
-        date_range_start = datetime.strptime(date_range["start_date"], "%Y-%m-%d").date()
-        today = datetime.now(user_tz).date()
-        
-        if date_range_start > today:
-            # Future-oriented summary
-            summary_prompt = f"""
-            You are a helpful assistant. The user wants a summary of their upcoming schedule based on the command:
-
-            User Command: "{request.command}"
-
-            Below are the meetings scheduled for the given time period:
-            {meetings_text}
-
-            Please create a natural language summary that directly addresses the user's request, focusing on the upcoming time period. 
-            Consider including:
-            - Types of meetings or activities planned.
-            - The total number of meetings and approximate total time they might spend.
-            - Any suggestions for managing their upcoming schedule.
-
-            Present it as a helpful, friendly, and conversational answer.
-            """
-        else:
-            # Past or current-oriented summary
-            summary_prompt = f"""
-            You are a helpful assistant. The user wants a summary of their meetings based on the command:
+        if isinstance(date_range, Exception):
+            raise date_range
+
+        events = None
+        range_start = date.fromisoformat(date_range["start_date"])
+        range_end = date.fromisoformat(date_range["end_date"])
+        if not isinstance(window_events, Exception) and window_start <= range_start and range_end <= window_end:
+            events = _events_in_range(window_events, date_range)
+
+        return await summarize_meetings(request.command, date_range, user_tz, events=events)
+    except Exception as e:
+        return {"error": f"Failed to generate meeting summary: {str(e)}"}
+
 
-            User Command: "{request.command}"
+async def _gpt_date_range(command, current_date):
+    response = await chat_completion(
+        model="gpt-4o",
+        messages=prompt_messages(MEETING_SUMMARY_PROMPT, command, f"Today's date is {current_date}."),
+        response_format={"type": "json_object"},
+        max_tokens=JSON_MAX_TOKENS,
+        temperature=0
+    )
+    parsed_data = response.choices[0].message.content
+    logger.debug("Parsed date range: %s", parsed_data)
+    return orjson.loads(parsed_data)
 
-            Below are the meetings we retrieved for the relevant time period:
-            {meetings_text}
+# Words that make a period relative to something else, e.g. "the day before yesterday"
+DATE_QUALIFIERS = frozenset(("before", "after", "of", "since", "until"))
 
-            Please create a natural language summary that directly addresses the user's request. Consider these guidelines:
-            - If the user asks for a general overview, provide a high-level summary of their meetings.
-            - If the user asks where they spent most of their time, highlight which activities took the majority of their schedule.
-            - If the user asks about a certain metric (like total number of meetings or total hours), include that.
-            - Provide one or two suggestions for improving time management if relevant.
+def resolve_date_range(command, today):
+    """
+    Resolve the relative periods MEETING_SUMMARY_PROMPT describes without GPT.
+    Returns {"start_date", "end_date"} or None when the command names no such period,
+    or names it in a way only GPT can resolve ("the week before last week", "last week
+    of next month").
+    """
+    cmd_lower = command.lower()
+    if not DATE_QUALIFIERS.isdisjoint(re.findall(r"[a-z]+", cmd_lower)):
+        return None
+    monday = today + relativedelta(weekday=MO(-1))
+    first_of_month = today + relativedelta(day=1)
+    # (start, end) offsets from monday / first_of_month / today
+    periods = [
+        ("last week", monday, relativedelta(weeks=-1), relativedelta(days=-1)),
+        ("this week", monday, relativedelta(), relativedelta(days=6)),
+        ("next week", monday, relativedelta(weeks=1), relativedelta(weeks=2, days=-1)),
+        ("yesterday", today, relativedelta(days=-1), relativedelta(days=-1)),
+        ("tomorrow", today, relativedelta(days=1), relativedelta(days=1)),
+        ("today", today, relativedelta(), relativedelta()),
+        ("last month", first_of_month, relativedelta(months=-1), relativedelta(days=-1)),
+        ("this month", first_of_month, relativedelta(), relativedelta(months=1, days=-1)),
+        ("next month", first_of_month, relativedelta(months=1), relativedelta(months=2, days=-1))
+    ]
+    # Whole words only: "this weekend" and "last monthly review" are not periods here
+    matches = [period for period in periods if re.search(rf"\b{period[0]}\b", cmd_lower)]
+    # Two periods ("last week and this month") combine in ways left to GPT
+    if len(matches) != 1:
+        return None
+    _, anchor, start, end = matches[0]
+    return {"start_date": (anchor + start).isoformat(), "end_date": (anchor + end).isoformat()}
+
+def _speculative_window(today):
+    # First day of last month through the last day of next month
+    first_of_month = today + relativedelta(day=1)
+    return first_of_month + relativedelta(months=-1), first_of_month + relativedelta(months=2, days=-1)
+
+def _parse_event_time(when):
+    if "dateTime" in when:
+        return parse_utc(when["dateTime"])
+    # All-day events only carry a date
+    return datetime.fromisoformat(when["date"]).replace(tzinfo=UTC)
+
+def _events_in_range(events, date_range):
+    """
+    Narrow already-fetched events to date_range, with the same overlap rule Calendar applies.
+    """
+    start = datetime.fromisoformat(f"{date_range['start_date']}T00:00:00+00:00")
+    end = datetime.fromisoformat(f"{date_range['end_date']}T23:59:59+00:00")
+    return [
+        event for event in events
+        if _parse_event_time(event["end"]) > start and _parse_event_time(event["start"]) < end
+    ]
+
+NO_MEETINGS_MESSAGE = "No meetings found in the specified date range."
+
+# Events are sent to GPT as compact JSON with only the fields summaries use
+EVENT_TITLE_MAX_CHARS = 64
+ATTENDEE_KEYWORDS = ("attendee", "with whom", "who ", "people")
+
+def _project_event(event, with_attendees):
+    start, end = event.get("start", {}), event.get("end", {})
+    projected = {
+        "title": event.get("summary", "No Title")[:EVENT_TITLE_MAX_CHARS],
+        "start": start.get("dateTime") or start.get("date", ""),
+        "end": end.get("dateTime") or end.get("date", "")
+    }
+    if start and end:
+        # Precomputed so GPT doesn't have to do time arithmetic
+        projected["duration_minutes"] = int((_parse_event_time(end) - _parse_event_time(start)).total_seconds() // 60)
+    if with_attendees and event.get("attendees"):
+        projected["attendees"] = [a.get("displayName") or a.get("email", "") for a in event["attendees"]]
+    return projected
+
+def _summary_messages(command, date_range, events, today):
+    # Attendee lists are the bulk of an event, so only send them when asked about
+    cmd_lower = command.lower()
+    with_attendees = any(keyword in cmd_lower for keyword in ATTENDEE_KEYWORDS)
+    meetings_text = orjson.dumps([_project_event(event, with_attendees) for event in events]).decode()
 
-            Your response should be helpful, friendly, and conversational.
-            """
+    # Determine if the date range is in the future or past
+    if date.fromisoformat(date_range["start_date"]) > today:
+        # Future-oriented summary
+        summary_prompt = UPCOMING_SUMMARY_PROMPT
+    else:
+        # Past or current-oriented summary
+        summary_prompt = PAST_SUMMARY_PROMPT
+    return prompt_messages(summary_prompt, command, f"Meetings in the requested period:\n{meetings_text}")
 
-        summary_response = client.chat.completions.create(
+async def summarize_meetings(command, date_range, user_tz, events=None):
+    """
+    Summarize the meetings in date_range ({"start_date", "end_date"}) for the given command.
+    Pass events when they have already been fetched for that range.
+    """
+    try:
+        if events is None:
+            # Fetch events from Google Calendar for the given date range
+            start_datetime = f"{date_range['start_date']}T00:00:00Z"
+            end_datetime = f"{date_range['end_date']}T23:59:59Z"
+
+            events = await list_calendar_events(start_datetime, end_datetime)
+        if not events:
+            return {"message": NO_MEETINGS_MESSAGE}
+
+        # Stream the summary so the client can show it as it is generated
+        summary_stream = await chat_completion(
             model="gpt-4o",
-            messages=[{"role": "system", "content": summary_prompt}]
+            messages=_summary_messages(command, date_range, events, datetime.now(user_tz).date()),
+            max_tokens=SUMMARY_MAX_TOKENS,
+            stream=True
+        )
+        return StreamingResponse(
+            _stream_summary(summary_stream),
+            media_type="text/event-stream",
+            # Keep proxies from buffering the stream
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
         )
-        gpt_summary = summary_response.choices[0].message.content
-        return {"summary": gpt_summary}
     except Exception as e:
         return {"error": f"Failed to generate meeting summary: {str(e)}"}
 
+def _sse(data, event=None):
+    # JSON-encode the data so newlines in the text can't break the event framing
+    frame = f"event: {event}\n" if event else ""
+    return f"{frame}data: {orjson.dumps(data).decode()}\n\n"
 
-@app.post("/interpret-and-create-event")
-def interpret_and_create_event(request: CommandRequest):
+async def _stream_summary(summary_stream):
+    """
+    Relay the summary as server-sent events: text deltas, then an "error" or "done" event.
+    """
     try:
-        user_timezone = get_user_timezone()
-        try:
-            user_tz = pytz.timezone(user_timezone)
-        except UnknownTimeZoneError:
-            user_tz = pytz.utc
+        async for chunk in summary_stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield _sse(chunk.choices[0].delta.content)
+    except Exception as e:
+        # Headers are already sent, so report the failure in the stream
+        logger.warning("Summary stream failed: %s", e)
+        yield _sse(f"Failed to finish meeting summary: {str(e)}", event="error")
+        return
+    yield _sse("", event="done")
 
-        current_date = datetime.now(user_tz).strftime("%Y-%m-%d")
 
-        prompt = f"""
-        You are a smart assistant helping users schedule events. Interpret the following command and extract:
-        1. Event title
-        2. Date (YYYY-MM-DD) considering today's date is {current_date}
-        3. Time (HH:MM)
-        4. Duration in minutes (if mentioned, else 30)
+class BulkSummaryRequest(BaseModel):
+    commands: List[str]
+    user_timezone: Optional[str] = None
+
+# Batch results are immutable once a batch finishes, so keep them rather than
+# downloading the output file on every poll
+BATCH_TERMINAL_STATUSES = frozenset(["completed", "failed", "expired", "cancelled"])
+_batch_status_cache = TTLCache(maxsize=256, ttl=3600)
+
+# Commands per bulk request, and how many of them resolve their dates and events at
+# once; each one is a Calendar request (plus a GPT call for free-form dates)
+BULK_MAX_COMMANDS = 100
+BULK_PREPARE_CONCURRENCY = 8
+_bulk_prepare_semaphore = asyncio.Semaphore(BULK_PREPARE_CONCURRENCY)
 
-        Only output a valid JSON object with fields:
-        {{
-          "title": "Event Title",
-          "date": "YYYY-MM-DD",
-          "time": "HH:MM",
-          "duration_minutes": integer
-        }}
+async def _batch_request_line(custom_id, command, today):
+    """
+    Build the Batch API request for one summary, or return None when there are no meetings to summarize.
+    """
+    async with _bulk_prepare_semaphore:
+        date_range = resolve_date_range(command, today) or await _gpt_date_range(command, today.isoformat())
+        events = await list_calendar_events(f"{date_range['start_date']}T00:00:00Z", f"{date_range['end_date']}T23:59:59Z")
+    if not events:
+        return None
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": "gpt-4o",
+            "messages": _summary_messages(command, date_range, events, today),
+            "max_tokens": SUMMARY_MAX_TOKENS
+        }
+    }
 
-        No extra text or comments.
+@app.post("/meeting-summary-bulk")
+async def meeting_summary_bulk(request: BulkSummaryRequest, http_request: ClientRequest):
+    """
+    Queue summaries for many commands through the OpenAI Batch API, which costs half as much
+    as real-time calls but may take up to 24h. Poll /batch-status/{batch_id} for the results.
+    """
+    if len(request.commands) > BULK_MAX_COMMANDS:
+        return {"error": f"At most {BULK_MAX_COMMANDS} commands can be summarized per request."}
 
-        Command: "{request.command}"
-        """
+    user_timezone = await request_timezone(request, http_request)
+    today = datetime.now(_tz(user_timezone)).date()
 
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "system", "content": prompt}]
+    custom_ids = [f"summary-{i}" for i in range(len(request.commands))]
+    # Date ranges and events are still resolved in real time; only the summaries are batched
+    lines = await asyncio.gather(
+        *(_batch_request_line(custom_id, command, today) for custom_id, command in zip(custom_ids, request.commands)),
+        return_exceptions=True
+    )
+
+    results = {}
+    batch_lines = []
+    for custom_id, line in zip(custom_ids, lines):
+        if isinstance(line, Exception):
+            results[custom_id] = {"error": f"Failed to prepare meeting summary: {str(line)}"}
+        elif line is None:
+            results[custom_id] = {"message": NO_MEETINGS_MESSAGE}
+        else:
+            batch_lines.append(orjson.dumps(line))
+
+    if not batch_lines:
+        return {"batch_id": None, "results": results}
+
+    try:
+        batch_file = await client.files.create(
+            file=("meeting-summaries.jsonl", b"\n".join(batch_lines)),
+            purpose="batch"
+        )
+        batch = await client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
         )
+    except Exception as e:
+        # Keep the per-command results that didn't need the batch
+        return {"error": f"Failed to queue meeting summaries: {str(e)}", "results": results}
+    return {"batch_id": batch.id, "status": batch.status, "results": results}
+
+async def _read_batch_results(file_id):
+    output = await client.files.content(file_id)
+    results = {}
+    for line in output.content.splitlines():
+        item = orjson.loads(line)
+        body = (item.get("response") or {}).get("body") or {}
+        if body.get("choices"):
+            results[item["custom_id"]] = {"summary": body["choices"][0]["message"]["content"]}
+        else:
+            error = item.get("error") or body.get("error") or {}
+            results[item["custom_id"]] = {"error": f"Failed to generate meeting summary: {error.get('message', 'unknown error')}"}
+    return results
+
+@app.get("/batch-status/{batch_id}")
+async def batch_status(batch_id: str):
+    cached = _batch_status_cache.get(batch_id)
+    if cached is not None:
+        return cached
+    try:
+        batch = await client.batches.retrieve(batch_id)
+        status = {
+            "batch_id": batch.id,
+            "status": batch.status,
+            "request_counts": batch.request_counts.model_dump() if batch.request_counts else None
+        }
+        if batch.status in BATCH_TERMINAL_STATUSES:
+            results = {}
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if file_id:
+                    results.update(await _read_batch_results(file_id))
+            status["results"] = results
+            _batch_status_cache[batch_id] = status
+        return status
+    except Exception as e:
+        return {"error": f"Failed to fetch batch status: {str(e)}"}
+
+@app.post("/interpret-and-create-event")
+async def interpret_and_create_event(request: CommandRequest, http_request: ClientRequest):
+    try:
+        user_timezone = await request_timezone(request, http_request)
+        user_tz = _tz(user_timezone)
+        user_timezone = user_tz.key
 
-        parsed_data = response.choices[0].message.content.strip()
-        print("GPT Parsed Data:", parsed_data)
+        current_date = datetime.now(user_tz).strftime("%Y-%m-%d")
+
+        # Any pending token refresh doesn't depend on GPT's output, so it runs alongside the
+        # extraction call; a credential failure resurfaces at the calendar request
+        response, _ = await asyncio.gather(
+            chat_completion(
+                model="gpt-4o",
+                messages=prompt_messages(EVENT_EXTRACTION_PROMPT, request.command, f"Today's date is {current_date}."),
+                response_format={"type": "json_object"},
+                max_tokens=JSON_MAX_TOKENS,
+                temperature=0
+            ),
+            get_creds_async(),
+            return_exceptions=True
+        )
+        if isinstance(response, Exception):
+            raise response
 
-        json_match = re.search(r"\{.*?\}", parsed_data, re.DOTALL)
-        if not json_match:
-            return {"error": "Failed to parse valid JSON from GPT response"}
+        parsed_data = response.choices[0].message.content
+        logger.debug("GPT parsed data: %s", parsed_data)
 
-        event_info = json.loads(json_match.group())
-        if not all(k in event_info for k in ["title", "date", "time", "duration_minutes"]):
+        event_info = orjson.loads(parsed_data)
+        if not all(k in event_info for k in INTENT_FIELDS["create-event"]):
             return {"error": "Incomplete event information from GPT"}
 
+        return await schedule_event(event_info, user_timezone, user_tz, request.user_id)
+    except Exception as e:
+        return {"error": f"Failed to interpret and create event: {str(e)}"}
+
+
+async def schedule_event(event_info, user_timezone, user_tz, user_id=DEFAULT_USER_ID):
+    """
+    Create the event described by event_info, or hold it for confirmation if it overlaps.
+    """
+    try:
         event_time_local = datetime.strptime(f"{event_info['date']} {event_info['time']}", "%Y-%m-%d %H:%M")
-        event_time_utc = user_tz.localize(event_time_local).astimezone(pytz.utc)
+        event_time_utc = event_time_local.replace(tzinfo=user_tz).astimezone(UTC)
 
         duration_minutes = event_info["duration_minutes"]
         event_end_utc = event_time_utc + timedelta(minutes=duration_minutes)
@@ -406,20 +815,10 @@ def interpret_and_create_event(request: CommandRequest):
         end_time_google = event_end_utc.strftime("%Y-%m-%dT%H:%M:%SZ")
 
         # Check for conflicts
-        service = build_service()
-        events_result = service.events().list(
-            calendarId='primary',
-            timeMin=start_time_google,
-            timeMax=end_time_google,
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-
-        overlapping_events = events_result.get('items', [])
+        overlapping_events = await list_calendar_events(start_time_google, end_time_google)
 
         if overlapping_events:
             # Store event details and prompt user for confirmation
-            user_id = "default_user"
             pending_events[user_id] = {
                 "title": event_info["title"],
                 "start_time": start_time_google,
@@ -430,7 +829,7 @@ def interpret_and_create_event(request: CommandRequest):
             return {"message": "There's an overlap with another event. Would you still like to schedule it?"}
         else:
             # No conflicts, schedule the event immediately
-            result = create_calendar_event(
+            result = await create_calendar_event(
                 summary=event_info["title"],
                 start_time=start_time_google,
                 end_time=end_time_google,
@@ -444,26 +843,20 @@ def interpret_and_create_event(request: CommandRequest):
 
 
 @app.post("/interpret-command-date-time")
-def interpret_command_date_time(request: CommandRequest):
+async def interpret_command_date_time(request: CommandRequest):
     """
     Interpret date and time references.
     """
-    current_date = datetime.now(pytz.utc).strftime("%Y-%m-%d")
-    prompt = f"""
-    Interpret the following command and extract date and time references. Output JSON with:
-    - "date" in YYYY-MM-DD.
-    - "time" in HH:MM format.
-
-    Command: "{request.command}"
-    """
+    current_date = datetime.now(UTC).strftime("%Y-%m-%d")
     try:
-        response = client.chat.completions.create(
+        response = await chat_completion(
             model="gpt-4o",
-            messages=[{"role": "system", "content": prompt}]
+            messages=prompt_messages(DATE_TIME_PROMPT, request.command, f"Today's date is {current_date}."),
+            response_format={"type": "json_object"},
+            max_tokens=JSON_MAX_TOKENS,
+            temperature=0
         )
-        parsed_data = response.choices[0].message.content.strip()
-        json_match = re.search(r"\{.*?\}", parsed_data, re.DOTALL)
-        return json.loads(json_match.group())
+        return orjson.loads(response.choices[0].message.content)
     except Exception as e:
         return {"error": f"Failed to interpret command: {str(e)}"}
 
@@ -0,0 +1,87 @@
+import os
+import asyncio
+import time
+from openai import AsyncOpenAI, APIConnectionError, InternalServerError, RateLimitError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+import httpx
+
+from resilience import CircuitBreaker, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS
+
+client = AsyncOpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    http_client=httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+    ),
+    # Retries are handled by chat_completion below
+    max_retries=0
+)
+
+OPENAI_MAX_CONCURRENT_REQUESTS = int(os.getenv("OPENAI_MAX_CONCURRENT_REQUESTS", "10"))
+OPENAI_MAX_REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_MAX_REQUESTS_PER_MINUTE", "500"))
+OPENAI_REQUEST_TIMEOUT = float(os.getenv("OPENAI_REQUEST_TIMEOUT_SECONDS", "15"))
+# Cap on a whole chat_completion call, retries and backoff included. A command can make
+# two calls in a row, and both must finish inside local_assistant's REQUEST_TIMEOUT, or
+# the client gives up while the server goes on to create the event
+OPENAI_TOTAL_TIMEOUT = float(os.getenv("OPENAI_TOTAL_TIMEOUT_SECONDS", "25"))
+# Yes/no reply classification doesn't need the full model; routing (which also extracts
+# event fields), extraction and summaries keep gpt-4o
+OPENAI_CLASSIFY_MODEL = os.getenv("OPENAI_CLASSIFY_MODEL", "gpt-4o-mini")
+# Output caps: the JSON replies are a handful of short fields, summaries a few paragraphs
+JSON_MAX_TOKENS = 128
+SUMMARY_MAX_TOKENS = 512
+
+class RequestRateLimiter:
+    """
+    Token bucket limiting how many requests may start per minute.
+    """
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.rate = per_minute / 60
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+_openai_rate_limiter = RequestRateLimiter(OPENAI_MAX_REQUESTS_PER_MINUTE)
+_openai_semaphore = asyncio.Semaphore(OPENAI_MAX_CONCURRENT_REQUESTS)
+_openai_breaker = CircuitBreaker("OpenAI", CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS)
+
+# Errors that mean OpenAI is overloaded or unreachable rather than that the request was bad
+OPENAI_TRANSIENT_ERRORS = (RateLimitError, APIConnectionError, InternalServerError, asyncio.TimeoutError)
+
+@retry(
+    wait=wait_random_exponential(multiplier=1, max=10),
+    stop=stop_after_attempt(3),
+    retry=retry_if_exception_type(OPENAI_TRANSIENT_ERRORS),
+    reraise=True
+)
+async def _create_with_retries(**kwargs):
+    await _openai_rate_limiter.acquire()
+    async with _openai_semaphore:
+        return await asyncio.wait_for(client.chat.completions.create(**kwargs), timeout=OPENAI_REQUEST_TIMEOUT)
+
+async def chat_completion(**kwargs):
+    """
+    Rate-limited client.chat.completions.create with per-attempt and overall timeouts and
+    jittered exponential backoff on transient errors. Raises CircuitOpenError without calling
+    OpenAI while it keeps failing.
+    """
+    _openai_breaker.check()
+    try:
+        response = await asyncio.wait_for(_create_with_retries(**kwargs), timeout=OPENAI_TOTAL_TIMEOUT)
+    except OPENAI_TRANSIENT_ERRORS:
+        _openai_breaker.record_failure()
+        raise
+    _openai_breaker.record_success()
+    return response
@@ -0,0 +1,32 @@
+import time
+
+class CircuitOpenError(Exception):
+    pass
+
+class CircuitBreaker:
+    """
+    Fail fast after `threshold` consecutive failures, letting calls through again after `reset_timeout` seconds.
+    """
+    def __init__(self, name, threshold, reset_timeout):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+
+    def check(self):
+        if self.opened_at is not None and time.monotonic() - self.opened_at < self.reset_timeout:
+            raise CircuitOpenError(f"{self.name} is unavailable, not retrying for now")
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        # Also re-opens after a failed trial call once the timeout has passed
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_SECONDS = 30